@@ -41,16 +41,24 @@ def get_1min(symbol):
         useRTH=True
     )
 
-    df = util.df(trades)[['date','high','low','close','volume']]
-    df = df.rename(columns={'date':'timestamp','close':'last'})
-
-    df['bid'] = util.df(bid)['close']
-    df['ask'] = util.df(ask)['close']
-    df['symbol'] = symbol
+    # Build all columns once, then the DataFrame once (bid/ask matched by bar time)
+    bid_close = {b.date: b.close for b in bid}
+    ask_close = {b.date: b.close for b in ask}
+
+    df = pd.DataFrame({
+        'timestamp': [b.date for b in trades],
+        'high': [b.high for b in trades],
+        'low': [b.low for b in trades],
+        'last': [b.close for b in trades],
+        'volume': [b.volume for b in trades],
+        'bid': [bid_close.get(b.date, float('nan')) for b in trades],
+        'ask': [ask_close.get(b.date, float('nan')) for b in trades],
+        'symbol': symbol,
+    })
 
     return df
 
-df = pd.concat([get_1min('AAPL'), get_1min('AMZN')])
+df = pd.concat([get_1min('AAPL'), get_1min('AMZN')], ignore_index=True)
 print(df.head())
 print(df.tail())
 
@@ -78,18 +86,20 @@ def place_mkt_order(ticker, side, volume, max_position=0):
     return trade
 
 def trades_df(trade):
-    fills_df = util.df(trade.fills)
-    if fills_df is None or fills_df.empty:
+    fills = trade.fills
+    if not fills:
         print("No fills (order not filled). Check TWS Orders/Trades for details.")
         return
-    
-    fills_df['exec_time'] = fills_df['execution'].apply(lambda e: e.time)
-    fills_df['exec_price'] = fills_df['execution'].apply(lambda e: e.price)
-    fills_df['exec_shares'] = fills_df['execution'].apply(lambda e: e.shares)
-    fills_df['commission'] = fills_df['commissionReport'].apply(
-        lambda c: c.commission if c and c.commission is not None else float('nan')
-    )
-    return fills_df[['exec_time','exec_price','exec_shares','commission']]
+
+    return pd.DataFrame({
+        'exec_time': [f.execution.time for f in fills],
+        'exec_price': [f.execution.price for f in fills],
+        'exec_shares': [f.execution.shares for f in fills],
+        'commission': [
+            c.commission if c and c.commission is not None else float('nan')
+            for c in (f.commissionReport for f in fills)
+        ],
+    })
 
 
 aapl_trade = place_mkt_order('AAPL', 'BUY', 100, max_position=300)
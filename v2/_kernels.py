@@ -0,0 +1,241 @@
+# _kernels.py
+# Numba kernels shared by backtest_v2 and feature_layer_v2.
+#
+# The functions here are plain Python; the importing modules JIT them with
+# @njit. For live trading, run `python _kernels.py` once to build them ahead
+# of time into the bt_kernels extension next to this file: when it is
+# importable the callers use it and skip JIT compilation on the first tick.
+#
+# Rebuild after editing any kernel here: the build embeds a hash of the kernel
+# sources and load_aot() ignores (with a warning) an extension whose hash no
+# longer matches. The AOT functions hold the GIL, unlike the nogil JIT ones.
+#
+# move_std is not a kernel: it is the shared rolling-std helper (bottleneck
+# when installed, pandas otherwise) and is neither JIT-compiled nor hashed.
+
+import functools
+import inspect
+import os
+import warnings
+import zlib
+
+import numpy as np
+import pandas as pd
+
+try:
+    # optional: bottleneck's move_std for rolling std, else pandas rolling
+    import bottleneck as bn
+except ImportError:
+    bn = None
+
+
+def run_backtest(z, beta, pa, pb, z_entry, z_exit, notional, beta_neutral,
+                 cost, stop_z, max_hold, initial_capital):
+    """
+    Single-pass trading state machine over raw bar arrays.
+
+    stop_z=nan disables the stop, max_hold<0 disables the holding limit.
+    Returns (equity per bar, trade count).
+    """
+    n = z.shape[0]
+    equity = np.empty(n, dtype=np.float64)
+
+    capital = initial_capital
+
+    # position: +1 means long spread (long A, short B*beta), -1 means short spread
+    position = 0
+    entry_i = -1
+
+    # shares
+    sh_a = 0.0
+    sh_b = 0.0
+
+    trade_count = 0
+
+    for i in range(n):
+        zi = z[i]
+        price_a = pa[i]
+        price_b = pb[i]
+
+        # optional stop (comparison with nan is always False)
+        stop_out = abs(zi) >= stop_z
+
+        # check max hold
+        held_too_long = False
+        if position != 0 and max_hold >= 0:
+            held_too_long = (i - entry_i) >= max_hold
+
+        # ENTRY
+        if position == 0:
+            if zi > z_entry:
+                position = -1  # short spread
+            elif zi < -z_entry:
+                position = 1   # long spread
+
+            if position != 0:
+                # leg A: fixed notional
+                sh_a = (notional / price_a) * position
+
+                # leg B: fixed notional, optionally scaled by beta
+                scale = abs(beta[i]) if beta_neutral else 1.0
+                sh_b = -(notional * scale / price_b) * position
+
+                # pay entry costs
+                capital -= cost
+                trade_count += 1
+                entry_i = i
+
+        # Mark-to-market: capital is cash, legs are valued at current prices
+        eq = capital + sh_a * price_a + sh_b * price_b
+        equity[i] = eq
+
+        # EXIT: realize and flatten AFTER recording equity at this bar
+        if position != 0 and ((abs(zi) < z_exit) or stop_out or held_too_long):
+            capital = eq - cost
+
+            position = 0
+            sh_a = 0.0
+            sh_b = 0.0
+            entry_i = -1
+
+    return equity, trade_count
+
+
+def rolling_mean_std(x, w, ddof=1):
+    """
+    Single-pass rolling mean/std over a window of w samples.
+
+    Uses Welford's update when the window is filling and the matching
+    add-one/drop-one update once it is full, so each bar costs O(1).
+    A NaN restarts the window, so outputs are NaN until w consecutive
+    valid samples have been seen (same as pandas min_periods=w).
+    """
+    n = x.shape[0]
+    out_mean = np.full(n, np.nan)
+    out_std = np.full(n, np.nan)
+
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+
+    for i in range(n):
+        xi = x[i]
+        if np.isnan(xi):
+            count = 0
+            mean = 0.0
+            m2 = 0.0
+            continue
+
+        if count < w:
+            count += 1
+            delta = xi - mean
+            mean += delta / count
+            m2 += delta * (xi - mean)
+        else:
+            x_old = x[i - w]
+            old_mean = mean
+            mean += (xi - x_old) / w
+            m2 += (xi - x_old) * (xi - mean + x_old - old_mean)
+
+        if count == w:
+            if m2 < 0.0:
+                m2 = 0.0
+            out_mean[i] = mean
+            # w <= ddof has no defined std (pandas gives NaN); leave it NaN
+            if w > ddof:
+                out_std[i] = np.sqrt(m2 / (w - ddof))
+
+    return out_mean, out_std
+
+
+def vwap(high, low, close, volume):
+    """
+    Cumulative VWAP in one pass: typical price * volume and volume are
+    accumulated together instead of via two separate cumsum Series.
+    NaN bars are skipped in the sums and yield NaN, like Series.cumsum;
+    bars before any volume has traded yield NaN (0/0 in pandas).
+    """
+    n = close.shape[0]
+    out = np.empty(n, dtype=np.float64)
+    spv = 0.0
+    sv = 0.0
+    for i in range(n):
+        v = volume[i]
+        pv = (high[i] + low[i] + close[i]) / 3.0 * v
+        if not np.isnan(pv):
+            spv += pv
+        if not np.isnan(v):
+            sv += v
+        if np.isnan(pv) or np.isnan(v) or sv == 0.0:
+            out[i] = np.nan
+        else:
+            out[i] = spv / sv
+    return out
+
+
+def move_std(x, w, ddof=1):
+    """
+    Rolling std with min_periods=w, computed in float64.
+    Uses bottleneck.move_std when installed, pandas rolling otherwise.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) < w:
+        # no full window yet (bottleneck rejects window > len)
+        return np.full(len(x), np.nan)
+    if bn is not None:
+        return bn.move_std(x, window=w, min_count=w, ddof=ddof)
+    return pd.Series(x).rolling(w).std(ddof=ddof).to_numpy()
+
+
+# Fingerprint of the kernel sources; frozen into the AOT build via source_hash()
+SOURCE_HASH = zlib.crc32(
+    "".join(inspect.getsource(f) for f in (run_backtest, rolling_mean_std, vwap)).encode()
+)
+
+
+def source_hash():
+    return SOURCE_HASH
+
+
+@functools.lru_cache(maxsize=None)
+def load_aot():
+    """
+    Return the bt_kernels extension if it was built from the current kernel
+    sources, else None (callers then JIT the functions above).
+    """
+    try:
+        import bt_kernels
+    except ImportError:
+        return None
+
+    built_hash = getattr(bt_kernels, "source_hash", None)
+    if built_hash is None or built_hash() != SOURCE_HASH:
+        warnings.warn(
+            "bt_kernels was built from an older _kernels.py; rebuild it with "
+            "`python _kernels.py`. Falling back to JIT kernels."
+        )
+        return None
+    return bt_kernels
+
+
+def build():
+    """Compile the kernels ahead of time into bt_kernels (numba.pycc)."""
+    from numba.pycc import CC
+
+    cc = CC("bt_kernels")
+    cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+    cc.export(
+        "run_backtest",
+        "Tuple((f8[:], i8))(f8[:], f8[:], f8[:], f8[:], f8, f8, f8, b1, f8, f8, i8, f8)",
+    )(run_backtest)
+    cc.export("rolling_mean_std_f4", "UniTuple(f8[:], 2)(f4[:], i8, i8)")(rolling_mean_std)
+    cc.export("rolling_mean_std_f8", "UniTuple(f8[:], 2)(f8[:], i8, i8)")(rolling_mean_std)
+    cc.export("vwap", "f8[:](f8[:], f8[:], f8[:], f8[:])")(vwap)
+    cc.export("source_hash", "i8()")(source_hash)
+
+    cc.compile()
+
+
+if __name__ == "__main__":
+    build()
@@ -1,5 +1,15 @@
 import pandas as pd
 import numpy as np
+from numba import njit
+
+import _kernels
+
+# ahead-of-time build (python _kernels.py) if current: no JIT on the first run
+_aot_kernels = _kernels.load_aot()
+if _aot_kernels is not None:
+    _run_kernel = _aot_kernels.run_backtest
+else:
+    _run_kernel = njit(cache=True)(_kernels.run_backtest)
 
 
 class Backtester:
@@ -28,8 +38,11 @@ class Backtester:
         max_hold_bars=None,           # NEW: optional risk control
         stop_z=None                   # NEW: optional stop if |z| too large
     ):
-        self.df_a = df_a.copy()
-        self.df_b = df_b.copy()
+        # Only the aligned close prices are needed; keep them as float64 arrays
+        # instead of copying both input frames.
+        self._idx = df_a.index.intersection(df_b.index)
+        self._pa = df_a.loc[self._idx, "close"].to_numpy(dtype=np.float64)
+        self._pb = df_b.loc[self._idx, "close"].to_numpy(dtype=np.float64)
         self.z_entry = z_entry
         self.z_exit = z_exit
         self.spread_window = spread_window
@@ -44,40 +57,39 @@ class Backtester:
         self.stop_z = stop_z
 
     def prepare_data(self):
-        idx = self.df_a.index.intersection(self.df_b.index)
-        df = pd.DataFrame(index=idx)
-
-        df["price_a"] = self.df_a.loc[idx, "close"]
-        df["price_b"] = self.df_b.loc[idx, "close"]
+        pa = self._pa
+        pb = self._pb
 
+        # Cache x/y as plain arrays; the regression below works on them directly
         if self.use_log_price_spread:
             # log prices for hedge regression
-            df["x"] = np.log(df["price_b"])
-            df["y"] = np.log(df["price_a"])
+            x = np.log(pb)
+            y = np.log(pa)
         else:
             # fallback: 5-min log returns as in your original
-            df["y"] = np.log(df["price_a"] / df["price_a"].shift(1))
-            df["x"] = np.log(df["price_b"] / df["price_b"].shift(1))
+            y = np.full(len(pa), np.nan)
+            x = np.full(len(pb), np.nan)
+            y[1:] = np.log(pa[1:] / pa[:-1])
+            x[1:] = np.log(pb[1:] / pb[:-1])
 
-        df = df.dropna()
+        valid = ~(np.isnan(pa) | np.isnan(pb) | np.isnan(x) | np.isnan(y))
+        x = x[valid]
+        y = y[valid]
 
         # Rolling hedge ratio beta (and optional alpha for log-price spread)
-        betas = []
-        alphas = []
-        for i in range(len(df)):
-            if i < self.hedge_window:
-                betas.append(np.nan)
-                alphas.append(np.nan)
-            else:
-                y = df["y"].iloc[i - self.hedge_window:i].values
-                x = df["x"].iloc[i - self.hedge_window:i].values
-                # y = alpha + beta*x
-                beta, alpha = np.polyfit(x, y, 1)
-                betas.append(beta)
-                alphas.append(alpha)
-
-        df["beta"] = betas
-        df["alpha"] = alphas
+        beta, alpha = _rolling_ols(x, y, self.hedge_window)
+
+        df = pd.DataFrame(
+            {
+                "price_a": pa[valid],
+                "price_b": pb[valid],
+                "x": x,
+                "y": y,
+                "beta": beta,
+                "alpha": alpha,
+            },
+            index=self._idx[valid],
+        )
 
         # Spread definition
         if self.use_log_price_spread:
@@ -86,7 +98,9 @@ class Backtester:
             df["spread"] = df["y"] - df["beta"] * df["x"]
 
         df["spread_mean"] = df["spread"].rolling(self.spread_window).mean()
-        df["spread_std"] = df["spread"].rolling(self.spread_window).std(ddof=0)
+        df["spread_std"] = _kernels.move_std(
+            df["spread"].to_numpy(), self.spread_window, ddof=0
+        )
         df["z"] = (df["spread"] - df["spread_mean"]) / df["spread_std"]
 
         return df.dropna()
@@ -100,86 +114,25 @@ class Backtester:
     def run(self):
         df = self.prepare_data()
 
-        capital = float(self.initial_capital)
-
-        # position: +1 means long spread (long A, short B*beta), -1 means short spread
-        position = 0
-        entry_idx = None
-
-        # shares
-        sh_a = 0.0
-        sh_b = 0.0
-
-        equity_series = []
-        trade_count = 0
-
-        for t, row in df.iterrows():
-            z = float(row["z"])
-            beta = float(row["beta"])
-            price_a = float(row["price_a"])
-            price_b = float(row["price_b"])
-
-            # optional stop
-            stop_out = (self.stop_z is not None) and (abs(z) >= float(self.stop_z))
-
-            # check max hold
-            held_too_long = False
-            if position != 0 and self.max_hold_bars is not None and entry_idx is not None:
-                # count bars since entry
-                held_bars = df.index.get_loc(t) - df.index.get_loc(entry_idx)
-                held_too_long = held_bars >= int(self.max_hold_bars)
-
-            # ENTRY
-            if position == 0:
-                if z > self.z_entry:
-                    position = -1  # short spread
-                elif z < -self.z_entry:
-                    position = 1   # long spread
-
-                if position != 0:
-                    # size positions
-                    # leg A: fixed notional
-                    sh_a = (self.notional_per_leg / price_a) * position
-
-                    # leg B: fixed notional, optionally scaled by beta
-                    scale = abs(beta) if self.beta_neutral else 1.0
-                    sh_b = -(self.notional_per_leg * scale / price_b) * position
-
-                    # pay entry costs
-                    capital -= self._trade_cost()
-                    trade_count += 1
-                    entry_idx = t
-
-            # EXIT
-            else:
-                if (abs(z) < self.z_exit) or stop_out or held_too_long:
-                    # realize PnL at exit: close both legs at current prices
-                    # realized pnl since entry is embedded in mark-to-market; simplest:
-                    # add current mark-to-market and then flatten by resetting shares and position.
-                    # We realize by updating capital with current MTM (computed below) and then zeroing.
-                    pass
-
-            # Mark-to-market PnL
-            mtm = sh_a * price_a + sh_b * price_b
-
-            # If in position, we want equity = capital + (MTM - entry_cost_basis).
-            # Since we deducted costs from capital and positions are sized in shares,
-            # we can treat mtm as the portfolio value of legs and capital as cash.
-            equity = capital + mtm
-            equity_series.append(equity)
-
-            # If we triggered exit, realize and flatten AFTER recording equity at this bar
-            if position != 0 and ((abs(z) < self.z_exit) or stop_out or held_too_long):
-                # Realize: set capital = equity (cash out), then pay exit cost, then flatten
-                capital = equity
-                capital -= self._trade_cost()
-
-                position = 0
-                sh_a = 0.0
-                sh_b = 0.0
-                entry_idx = None
-
-        results = pd.DataFrame({"equity": pd.Series(equity_series, index=df.index)})
+        stop_z = np.nan if self.stop_z is None else float(self.stop_z)
+        max_hold = -1 if self.max_hold_bars is None else int(self.max_hold_bars)
+
+        equity, trade_count = _run_kernel(
+            df["z"].to_numpy(dtype=np.float64),
+            df["beta"].to_numpy(dtype=np.float64),
+            df["price_a"].to_numpy(dtype=np.float64),
+            df["price_b"].to_numpy(dtype=np.float64),
+            float(self.z_entry),
+            float(self.z_exit),
+            self.notional_per_leg,
+            self.beta_neutral,
+            self._trade_cost(),
+            stop_z,
+            max_hold,
+            float(self.initial_capital),
+        )
+
+        results = pd.DataFrame({"equity": equity}, index=df.index)
         results["returns"] = results["equity"].pct_change()
 
         print("Total trades:", trade_count)
@@ -199,4 +152,40 @@ class Backtester:
         drawdown = (equity - rolling_max) / rolling_max
         max_dd = drawdown.min()
 
-        return {"Sharpe": sharpe, "Max_Drawdown": max_dd}
\ No newline at end of file
+        return {"Sharpe": sharpe, "Max_Drawdown": max_dd}
+
+
+def _rolling_ols(x, y, w):
+    """
+    Rolling OLS y = alpha + beta*x where bar i is fitted on bars [i-w, i).
+
+    Window sums of x, y, x*x, x*y come from differences of cumulative sums,
+    so the whole regression is a few vectorized passes. x/y are demeaned
+    first so W*sxx - sx^2 doesn't cancel catastrophically on log prices;
+    beta is shift-invariant and alpha is mapped back to the raw scale.
+    Returns (beta, alpha), NaN for the first w bars.
+    """
+    n = len(x)
+    beta = np.full(n, np.nan)
+    alpha = np.full(n, np.nan)
+    if n <= w:
+        return beta, alpha
+
+    x_mean = x.mean()
+    y_mean = y.mean()
+    xc = x - x_mean
+    yc = y - y_mean
+
+    def window_sum(a):
+        c = np.concatenate(([0.0], np.cumsum(a)))
+        return c[w:n] - c[:n - w]
+
+    sx = window_sum(xc)
+    sy = window_sum(yc)
+    sxx = window_sum(xc * xc)
+    sxy = window_sum(xc * yc)
+
+    b = (w * sxy - sx * sy) / (w * sxx - sx * sx)
+    beta[w:] = b
+    alpha[w:] = (y_mean + sy / w) - b * (x_mean + sx / w)
+    return beta, alpha
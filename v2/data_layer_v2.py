@@ -2,6 +2,8 @@
 # Data layer: connect to IBKR, qualify contracts, fetch minute bars + bid/ask/last
 # Upgraded to support multi-asset data retrieval
 
+import asyncio
+
 from ib_insync import IB, Stock, util
 
 
@@ -22,6 +24,26 @@ class IBKRDataClient:
         self.ib.qualifyContracts(*contracts.values())
         return contracts
         
+    def _gather_bars(self, contracts: dict, fetch_one, max_concurrent):
+        """
+        Run fetch_one(symbol, contract) for every contract concurrently,
+        with at most max_concurrent historical requests in flight
+        (IBKR pacing: ~50 requests / 10 s).
+        Returns dict[symbol] -> result, in the order of contracts.
+        """
+        async def _gather():
+            sem = asyncio.Semaphore(max_concurrent)
+
+            async def _limited(symbol, contract):
+                async with sem:
+                    return symbol, await fetch_one(symbol, contract)
+
+            return await asyncio.gather(
+                *[_limited(s, c) for s, c in contracts.items()]
+            )
+
+        return dict(self.ib.run(_gather()))
+
     def get_bars_multi(
         self,
         contracts: dict,
@@ -32,19 +54,17 @@ class IBKRDataClient:
         pause_sec=0.3,
         max_retries=2,
         retry_sleep_sec=3,
+        max_concurrent=6,
     ):
         """
         Fetch OHLCV bars for multiple assets.
+        Requests are issued concurrently (up to max_concurrent at a time).
         Returns dict[symbol] -> DataFrame (may be empty if failed)
         """
-        data_dict = {}
-    
-        for symbol, contract in contracts.items():
-            last_err = None
-    
+        async def _fetch(symbol, contract):
             for attempt in range(max_retries + 1):
                 try:
-                    bars = self.ib.reqHistoricalData(
+                    bars = await self.ib.reqHistoricalDataAsync(
                         contract,
                         endDateTime="",
                         durationStr=duration,
@@ -56,24 +76,20 @@ class IBKRDataClient:
                     df = util.df(bars)
                     if df is None:
                         df = util.df([])
-    
+
                     if len(df) > 0:
                         df["symbol"] = symbol
-    
-                    data_dict[symbol] = df
-                    last_err = None
-                    break
-    
-                except Exception as e:
-                    last_err = e
-                    self.ib.sleep(retry_sleep_sec)
-    
-            if last_err is not None:
-                data_dict[symbol] = util.df([])
-    
-            self.ib.sleep(pause_sec)
-    
-        return data_dict
+
+                    await asyncio.sleep(pause_sec)
+                    return df
+
+                except Exception:
+                    await asyncio.sleep(retry_sleep_sec)
+
+            await asyncio.sleep(pause_sec)
+            return util.df([])
+
+        return self._gather_bars(contracts, _fetch, max_concurrent)
     
     
     def get_bars(
@@ -96,16 +112,15 @@ class IBKRDataClient:
         return util.df(bars)
     
     # ====== NEW / MODIFIED ======
-    def get_minute_bars_multi(self, contracts: dict, duration="1 D", use_rth=True):
+    def get_minute_bars_multi(self, contracts: dict, duration="1 D", use_rth=True, max_concurrent=6):
         """
         Fetch 1-minute OHLCV bars for multiple assets.
+        Requests are issued concurrently (up to max_concurrent at a time).
         Returns:
             dict[symbol] -> DataFrame
         """
-        data_dict = {}
-
-        for symbol, contract in contracts.items():
-            bars = self.ib.reqHistoricalData(
+        async def _fetch(symbol, contract):
+            bars = await self.ib.reqHistoricalDataAsync(
                 contract,
                 endDateTime="",
                 durationStr=duration,
@@ -116,9 +131,9 @@ class IBKRDataClient:
             )
             df = util.df(bars)
             df["symbol"] = symbol  # attach symbol column
-            data_dict[symbol] = df
+            return df
 
-        return data_dict
+        return self._gather_bars(contracts, _fetch, max_concurrent)
     # ====== END NEW ======
 
     def get_minute_bars(self, contract, duration="1 D", use_rth=True):
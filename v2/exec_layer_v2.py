@@ -4,7 +4,6 @@
 from dataclasses import dataclass
 from typing import Dict, Any
 import pandas as pd
-import numpy as np
 from ib_insync import MarketOrder
 
 
@@ -12,7 +11,7 @@ from ib_insync import MarketOrder
 # 1️⃣ Strategy Parameters
 # ==========================================================
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class StrategyParams:
     z_entry: float = 0.3       # ↓ 降低门槛
     z_exit: float = 0.05       # ↓ 更小退出区间
@@ -21,7 +20,7 @@ class StrategyParams:
     high_vol_multiplier: float = 1.0
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ExecParams:
     cooldown_min: int = 1
 
@@ -54,10 +53,25 @@ def decide_portfolio_target(
     if features.empty:
         return {}
 
-    p = strategy_params
-    last_row = features.iloc[-1]
+    # scalar access, no row Series and no column copy
+    z = float(features["z_spread"].iat[-1])
+
+    return decide_target_from_z(z, state, strategy_params, exec_params, now_ts)
 
-    z = float(last_row["z_spread"]) if not pd.isna(last_row["z_spread"]) else np.nan
+
+def decide_target_from_z(
+    z: float,
+    state: Dict[str, Any],
+    strategy_params: StrategyParams,
+    exec_params: ExecParams,
+    now_ts: pd.Timestamp,
+) -> Dict[str, int]:
+    """
+    Same decision rule as decide_portfolio_target, driven by the latest
+    z_spread value directly (e.g. from feature_layer_v2.IncrementalSpread).
+    """
+
+    p = strategy_params
 
     print("Current z:", z)
     print("Entry threshold:", p.z_entry)
@@ -113,19 +127,30 @@ class Executor:
         self.exec_params = exec_params
         self.positions = {}   # 当前持仓记录
 
-    def get_position(self, symbol):
+    def snapshot_positions(self):
+        """
+        Take one {symbol: position} snapshot from IB for a rebalance.
+        Pass it to trade_to_target for each leg of that batch; take a new
+        one on the next rebalance.
+        """
+        self.positions = {p.contract.symbol: p.position for p in self.ib.positions()}
+        return self.positions
+
+    def get_position(self, symbol, positions=None):
 
-        positions = self.ib.positions()
+        # explicit per-rebalance snapshot
+        if positions is not None:
+            return positions.get(symbol, 0)
 
-        for p in positions:
+        for p in self.ib.positions():
             if p.contract.symbol == symbol:
                 return p.position
 
         return 0
 
-    def trade_to_target(self, symbol, contract, target_position, reason):
+    def trade_to_target(self, symbol, contract, target_position, reason, positions=None):
 
-        current_position = self.get_position(symbol)
+        current_position = self.get_position(symbol, positions)
 
         delta = target_position - current_position
 
@@ -2,8 +2,76 @@
 # Feature layer: compute single-asset intraday features
 # + cross-asset relative value features (NEW)
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import pandas as pd
+from numba import njit
+from scipy.signal import lfilter, lfilter_zi
+
+import _kernels
+
+# ahead-of-time build (python _kernels.py) if current: no JIT on the first tick
+_aot_kernels = _kernels.load_aot()
+
+
+# Features are stored as float32: they are compared against thresholds far
+# coarser than float32's ~1e-7 relative precision, and half-width arrays halve
+# memory traffic through the rolling windows. Running sums that accumulate over
+# the whole series (VWAP, the rolling mean/std state) stay in float64.
+FEATURE_DTYPE = np.float32
+
+
+def _ewm_fast(arr: np.ndarray, span: int) -> np.ndarray:
+    """
+    EMA equivalent to Series.ewm(span=span, adjust=False).mean(),
+    evaluated as the IIR filter y[n] = a*x[n] + (1-a)*y[n-1] seeded with x[0].
+    lfilter would carry a NaN forward forever, so inputs with NaN go through
+    pandas, which skips them.
+    """
+    if arr.size == 0:
+        return arr.copy()
+    if np.isnan(arr).any():
+        return (
+            pd.Series(arr).ewm(span=span, adjust=False).mean().to_numpy(dtype=arr.dtype)
+        )
+    alpha = 2.0 / (span + 1.0)
+    b = np.array([alpha], dtype=arr.dtype)
+    a = np.array([1.0, alpha - 1.0], dtype=arr.dtype)
+    y, _ = lfilter(b, a, arr, zi=lfilter_zi(b, a).astype(arr.dtype) * arr[0])
+    return y
+
+
+def _log_return(close: np.ndarray, k: int) -> np.ndarray:
+    """
+    k-bar log return log(close[i] / close[i-k]) in a single pass,
+    with k leading NaNs (same layout as Series.shift(k)).
+    """
+    out = np.full(close.shape[0], np.nan, dtype=close.dtype)
+    if close.shape[0] > k:
+        np.log(close[k:] / close[:-k], out=out[k:])
+    return out
+
+
+_rolling_mean_std_jit = njit(cache=True, nogil=True)(_kernels.rolling_mean_std)
+
+if _aot_kernels is not None:
+    _vwap_kernel = _aot_kernels.vwap
+else:
+    _vwap_kernel = njit(cache=True, nogil=True)(_kernels.vwap)
+
+
+def rolling_mean_std(x: np.ndarray, w: int, ddof: int = 1):
+    """
+    Single-pass rolling mean/std over a window of w samples
+    (see _kernels.rolling_mean_std). Returns float64 (mean, std) arrays.
+    """
+    if _aot_kernels is not None:
+        if x.dtype == np.float32:
+            return _aot_kernels.rolling_mean_std_f4(x, w, ddof)
+        return _aot_kernels.rolling_mean_std_f8(x.astype(np.float64, copy=False), w, ddof)
+    return _rolling_mean_std_jit(x, w, ddof)
 
 
 # ==========================================================
@@ -23,42 +91,68 @@ def add_intraday_features(
     """
     Add intraday features:
     log_ret, r_vol, vwap, ret_5m, ema_fast/slow, z_rvol, rvol_th
+
+    All features are float32 (see FEATURE_DTYPE) except vwap, whose
+    cumulative sums are kept in float64 to avoid drift.
     """
     df = df.copy()
+    close = df["close"].to_numpy(dtype=FEATURE_DTYPE)
 
     # log returns
-    df["log_ret"] = np.log(df["close"]).diff()
+    df["log_ret"] = _log_return(close, 1)
 
     # rolling volatility
-    df["r_vol"] = df["log_ret"].rolling(vol_window).std()
+    df["r_vol"] = _kernels.move_std(df["log_ret"].to_numpy(), vol_window).astype(FEATURE_DTYPE)
 
     # VWAP
-    tp = (df["high"] + df["low"] + df["close"]) / 3.0
-    pv = tp * df["volume"]
-    df["vwap"] = pv.cumsum() / df["volume"].cumsum()
+    df["vwap"] = _vwap_kernel(
+        df["high"].to_numpy(dtype=np.float64),
+        df["low"].to_numpy(dtype=np.float64),
+        df["close"].to_numpy(dtype=np.float64),
+        df["volume"].to_numpy(dtype=np.float64),
+    )
 
     # 5-min return
-    df["ret_5m"] = np.log(df["close"] / df["close"].shift(ret5_window))
+    df["ret_5m"] = _log_return(close, ret5_window)
 
     # EMAs
-    df["ema_fast"] = df["close"].ewm(span=ema_fast, adjust=False).mean()
-    df["ema_slow"] = df["close"].ewm(span=ema_slow, adjust=False).mean()
+    df["ema_fast"] = _ewm_fast(close, ema_fast)
+    df["ema_slow"] = _ewm_fast(close, ema_slow)
 
     # z-score of rolling volatility
     rv = df["r_vol"]
     rv_mean = rv.rolling(z_window).mean()
-    rv_std = rv.rolling(z_window).std()
-    df["z_rvol"] = (rv - rv_mean) / rv_std
+    rv_std = _kernels.move_std(rv.to_numpy(), z_window)
+    df["z_rvol"] = ((rv - rv_mean) / rv_std).astype(FEATURE_DTYPE)
 
     # rolling percentile threshold (last row only)
-    df["rvol_th"] = np.nan
-    recent = df["r_vol"].dropna().iloc[-vol_pctl_lookback:]
+    df["rvol_th"] = np.full(len(df), np.nan, dtype=FEATURE_DTYPE)
+    # percentile over the non-NaN values of the last vol_pctl_lookback bars
+    tail = df["r_vol"].to_numpy()[-vol_pctl_lookback:]
+    recent = tail[~np.isnan(tail)]
     if len(recent) > 20:
-        df.loc[df.index[-1], "rvol_th"] = float(np.nanpercentile(recent.values, vol_pctl))
+        df.loc[df.index[-1], "rvol_th"] = float(np.percentile(recent, vol_pctl))
 
     return df
 
 
+def add_intraday_features_multi(dfs_by_symbol: dict, max_workers=None, **kwargs) -> dict:
+    """
+    Run add_intraday_features for every symbol concurrently on a thread pool.
+    The heavy parts (NumPy, lfilter, the nogil JIT kernels) release the GIL,
+    so threads scale without copying frames into worker processes. The AOT
+    bt_kernels build holds the GIL, so its VWAP/rolling passes serialise.
+
+    Returns dict[symbol] -> feature DataFrame, same keys as the input.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            symbol: pool.submit(add_intraday_features, df, **kwargs)
+            for symbol, df in dfs_by_symbol.items()
+        }
+        return {symbol: fut.result() for symbol, fut in futures.items()}
+
+
 # ==========================================================
 # 2️⃣ NEW：跨资产相对价值特征
 # ==========================================================
@@ -85,6 +179,7 @@ def add_cross_asset_spread_features(
             spread_mean
             spread_std
             z_spread
+        (all float32, see FEATURE_DTYPE)
     """
 
     # Align on timestamp
@@ -92,15 +187,20 @@ def add_cross_asset_spread_features(
 
     # 20-period return (can represent 20-day if daily data,
     # or 20-minute if intraday — depends on input frequency)
-    df["ret_a"] = np.log(df_a["close"] / df_a["close"].shift(lookback_ret))
-    df["ret_b"] = np.log(df_b["close"] / df_b["close"].shift(lookback_ret))
+    close_a = df_a["close"].astype(FEATURE_DTYPE)
+    close_b = df_b["close"].astype(FEATURE_DTYPE)
+    df["ret_a"] = np.log(close_a / close_a.shift(lookback_ret))
+    df["ret_b"] = np.log(close_b / close_b.shift(lookback_ret))
 
     # Spread between assets
     df["spread"] = df["ret_a"] - df["ret_b"]
 
     # Rolling mean and std of spread
-    df["spread_mean"] = df["spread"].rolling(spread_window).mean()
-    df["spread_std"] = df["spread"].rolling(spread_window).std()
+    spread_mean, spread_std = rolling_mean_std(
+        df["spread"].to_numpy(), spread_window
+    )
+    df["spread_mean"] = spread_mean.astype(FEATURE_DTYPE)
+    df["spread_std"] = spread_std.astype(FEATURE_DTYPE)
 
     # Z-score of spread
     df["z_spread"] = (
@@ -108,4 +208,75 @@ def add_cross_asset_spread_features(
     ) / df["spread_std"]
 
     return df
+
+
+class IncrementalSpread:
+    """
+    Streaming version of add_cross_asset_spread_features for the live loop.
+
+    Keeps the last lookback_ret+1 closes of each leg and the last
+    spread_window spreads with a running mean/M2, so each new bar is O(1)
+    instead of rebuilding the whole frame every tick.
+
+    update(close_a, close_b) returns the z_spread of the new bar
+    (NaN until both windows are full). State is float64, so it agrees with
+    the float32 batch output only up to float32 rounding (~1e-4 in z).
+    Feed completed bars only: a bar cannot be revised once added.
+    """
+
+    def __init__(self, lookback_ret: int = 20, spread_window: int = 60):
+        self.lookback_ret = lookback_ret
+        self.spread_window = spread_window
+
+        self._close_a = deque(maxlen=lookback_ret + 1)
+        self._close_b = deque(maxlen=lookback_ret + 1)
+        self._spreads = deque(maxlen=spread_window)
+        self._mean = 0.0
+        self._m2 = 0.0
+
+        self.z = np.nan
+
+    def _reset_window(self):
+        self._spreads.clear()
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, close_a: float, close_b: float) -> float:
+        self._close_a.append(float(close_a))
+        self._close_b.append(float(close_b))
+
+        self.z = np.nan
+        if len(self._close_a) <= self.lookback_ret:
+            return self.z
+
+        spread = (
+            np.log(self._close_a[-1] / self._close_a[0])
+            - np.log(self._close_b[-1] / self._close_b[0])
+        )
+
+        # a NaN spread restarts the window, like rolling(...) with min_periods=w
+        if np.isnan(spread):
+            self._reset_window()
+            return self.z
+
+        w = self.spread_window
+        if len(self._spreads) < w:
+            self._spreads.append(spread)
+            delta = spread - self._mean
+            self._mean += delta / len(self._spreads)
+            self._m2 += delta * (spread - self._mean)
+        else:
+            old = self._spreads[0]
+            self._spreads.append(spread)
+            old_mean = self._mean
+            self._mean += (spread - old) / w
+            self._m2 += (spread - old) * (spread - self._mean + old - old_mean)
+
+        if len(self._spreads) < w:
+            return self.z
+
+        std = np.sqrt(max(self._m2, 0.0) / (w - 1))
+        if std > 0:
+            self.z = (spread - self._mean) / std
+        return self.z
 # ====== END NEW ======
\ No newline at end of file